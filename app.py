@@ -1,21 +1,27 @@
 import os
 import hashlib
 import logging
+import time
 from pathlib import Path
 import threading
-from flask import Flask, request, Response, stream_with_context, jsonify, render_template
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, Response, stream_with_context, jsonify, render_template, send_file
 from dotenv import load_dotenv
+import diskcache
 
 # --- Architectural Module Imports (Following Best Practices) ---
 from modules import (
+    acquire_cache_lock,
+    refresh_cache_lock,
+    release_cache_lock,
     setup_cache_directory,
     get_path_from_key,
     check_cache_exists,
-    stream_from_cache,
     touch_cache_file,
     fetch_and_parse,
     run_cleanup_routine,
-    create_tts_engine,
+    get_default_engine,
     TTSEngineError,
 )
 
@@ -33,8 +39,8 @@ logging.info("="*50)
 # ------------------------------------
 
 # --- Resilient Application Startup ---
-# Create TTS engine instance via factory function
-tts_engine = create_tts_engine()
+# The shared TTS engine is resolved on first use in read_stream via get_default_engine(), so it
+# is created in the worker process that streams rather than in whichever process imports app.
 try:
     # Ensure cache directory exists on startup
     setup_cache_directory()
@@ -42,14 +48,31 @@ except OSError as e:
     app.logger.critical(f"FATAL: Could not create or access cache directory. {e}", exc_info=True)
     # The application can still run but will fail on any cache operation.
 
-if not tts_engine:
-    app.logger.critical("TTS Engine failed to initialize. TTS functionality will be disabled.")
-
 
 # --- Constants and In-Memory Caches ---
 MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 200000))
-# Using a simple dictionary for the metadata cache, as logic is now handled manually.
-metadata_cache = {}
+METADATA_CACHE_MAX = int(os.getenv('METADATA_CACHE_MAX', 512))
+# How often (seconds) a generation refreshes its lock file's mtime, so cleanup never sees it as stale.
+LOCK_REFRESH_SECONDS = 60
+# Bounded LRU cache for metadata: an OrderedDict keeps recency order so the least
+# recently used URL can be evicted in O(1) once the cache is full.
+metadata_cache = OrderedDict()
+# Guards metadata_cache, which is shared by all request threads in a worker.
+metadata_cache_lock = threading.Lock()
+# Second-level metadata cache shared by all Gunicorn workers (SQLite-backed), so a URL
+# fetched by one worker is a hit for the others too.
+METADATA_STORE_DIR = Path(__file__).resolve().parent / 'meta_cache'
+METADATA_STORE_TTL_SECONDS = 86400
+# Best-effort: if the store cannot be opened, workers fall back to their in-process cache only.
+try:
+    METADATA_STORE = diskcache.Cache(str(METADATA_STORE_DIR), size_limit=64 * 1024 * 1024)
+except Exception as e:
+    app.logger.warning(f"Shared metadata cache unavailable at {METADATA_STORE_DIR}: {e}. Using in-process cache only.")
+    METADATA_STORE = None
+# Background pool that warms the metadata cache for the next chapter while the current one plays.
+PREFETCH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='prefetch')
+# URLs currently being prefetched (guarded by metadata_cache_lock) to avoid duplicate submissions.
+prefetch_in_flight = set()
 
 
 # --- Helper Functions ---
@@ -58,20 +81,95 @@ def get_metadata_with_cache(url: str):
     Manually implements a cache for metadata that *only* stores successful results.
     This prevents caching `None` or incomplete data, making the app more resilient.
     """
-    if url in metadata_cache:
+    with metadata_cache_lock:
+        metadata = metadata_cache.get(url)
+        if metadata is not None:
+            metadata_cache.move_to_end(url)
+    if metadata is not None:
         app.logger.info(f"Metadata cache HIT for: {url}")
-        return metadata_cache[url]
+        return metadata
+
+    metadata = _store_get(url)
+    if metadata is not None:
+        app.logger.info(f"Metadata shared cache HIT for: {url}")
+        _remember_metadata(url, metadata)
+        return metadata
 
     app.logger.info(f"Metadata cache MISS for: {url}")
     metadata = fetch_and_parse(url)
 
     # Only cache valid, complete results to avoid poisoning the cache.
     if metadata and metadata.get('content'):
-        metadata_cache[url] = metadata
+        _store_set(url, metadata)
+        _remember_metadata(url, metadata)
 
     return metadata
 
 
+def _store_get(url: str):
+    """Reads metadata from the shared store. Store errors (e.g. a locked database) count as a miss."""
+    if METADATA_STORE is None:
+        return None
+    try:
+        return METADATA_STORE.get(url)
+    except Exception as e:
+        app.logger.warning(f"Metadata shared cache read failed for {url}: {e}")
+        return None
+
+
+def _store_set(url: str, metadata: dict):
+    """Writes metadata to the shared store, logging instead of raising if the store fails (e.g. disk full)."""
+    if METADATA_STORE is None:
+        return
+    try:
+        METADATA_STORE.set(url, metadata, expire=METADATA_STORE_TTL_SECONDS)
+    except Exception as e:
+        app.logger.warning(f"Metadata shared cache write failed for {url}: {e}")
+
+
+def _remember_metadata(url: str, metadata: dict):
+    """Stores metadata in the in-process LRU cache, evicting the least recently used entry if full."""
+    with metadata_cache_lock:
+        metadata_cache[url] = metadata
+        metadata_cache.move_to_end(url)
+        if len(metadata_cache) > METADATA_CACHE_MAX:
+            metadata_cache.popitem(last=False)
+
+
+def _prefetch_metadata(url: str):
+    """Runs in PREFETCH_POOL: fetches and caches metadata, never raising into the pool."""
+    try:
+        get_metadata_with_cache(url)
+    except Exception as e:
+        app.logger.warning(f"Metadata prefetch failed for {url}: {e}")
+    finally:
+        with metadata_cache_lock:
+            prefetch_in_flight.discard(url)
+
+
+def prefetch_next_chapter(url: str):
+    """
+    Speculatively warms the metadata cache for the chapter after `url`, if its
+    metadata is already cached and the next chapter's is not.
+    """
+    with metadata_cache_lock:
+        metadata = metadata_cache.get(url)
+    if metadata is None:
+        # On an audio cache HIT this worker may never have loaded `url` itself: the frontend's
+        # /api/metadata request usually lands on another worker, which shares only the store.
+        metadata = _store_get(url)
+    next_url = metadata.get('next_url') if metadata else None
+    if not next_url:
+        return
+    with metadata_cache_lock:
+        if next_url in metadata_cache or next_url in prefetch_in_flight:
+            return
+        prefetch_in_flight.add(next_url)
+
+    app.logger.info(f"Prefetching metadata for next chapter: {next_url}")
+    PREFETCH_POOL.submit(_prefetch_metadata, next_url)
+
+
 # --- API Endpoints ---
 @app.route('/')
 def serve_frontend():
@@ -111,24 +209,59 @@ def read_stream():
     if not url:
         return jsonify({'error': 'URL không được để trống.'}), 400
 
+    tts_engine = get_default_engine()
     if not tts_engine:
          return jsonify({'error': 'Dịch vụ đọc truyện đang tạm thời gián đoạn. Mẹ có thể nghe lại các truyện đã có sẵn.'}), 503
 
-    cache_key = hashlib.md5(url.encode()).hexdigest()
+    # BLAKE2b is faster than MD5 in hashlib; the key is only a filename, not a security boundary.
+    cache_key = hashlib.blake2b(url.encode('utf-8'), digest_size=16).hexdigest()
     final_path = get_path_from_key(cache_key)
 
+    # Audio cached before the switch is still keyed by MD5; keep serving it until cleanup ages it out.
+    if not check_cache_exists(final_path):
+        legacy_path = get_path_from_key(hashlib.md5(url.encode()).hexdigest())
+        if check_cache_exists(legacy_path):
+            final_path = legacy_path
+
     if check_cache_exists(final_path):
         app.logger.info(f"Cache HIT for URL: {url}")
         touch_cache_file(final_path) # Critical for LRU cleanup logic
-        return Response(stream_with_context(stream_from_cache(final_path)), mimetype='audio/mpeg')
+        prefetch_next_chapter(url)
+        try:
+            # send_file hands the file to the WSGI server's file_wrapper (sendfile(2) under Gunicorn)
+            # and supports Range requests for seeking. Cached audio for a key never changes, so the
+            # key itself is a stable ETag even though touching the file updates its mtime.
+            resp = send_file(
+                final_path,
+                mimetype='audio/mpeg',
+                conditional=True,
+                etag=final_path.stem,
+                max_age=86400
+            )
+        except FileNotFoundError:
+            app.logger.warning(f"Cache file for {url} was deleted before it could be sent (race condition).")
+        else:
+            # Tell reverse proxies (nginx, etc.) not to buffer the whole MP3 before sending it.
+            resp.headers['X-Accel-Buffering'] = 'no'
+            return resp
 
-    # Use robust file-based locking for multi-process environments (like Gunicorn)
+    # Use a cross-process lock file for multi-process environments (like Gunicorn)
     lock_path = final_path.with_suffix('.lock')
-    if lock_path.exists():
+    lock_fd = acquire_cache_lock(lock_path)
+    if lock_fd is None:
         return jsonify({'error': 'Truyện này đang được chuẩn bị. Mẹ vui lòng thử lại sau vài giây.'}), 429
 
+    lock_released = False
+    def release_lock():
+        nonlocal lock_released
+        if lock_released:
+            return
+        lock_released = True
+        release_cache_lock(lock_fd, lock_path)
+        app.logger.info(f"LOCK released for URL: {url}")
+
+    streaming = False
     try:
-        lock_path.touch() # Create lock file
         app.logger.info(f"Cache MISS and LOCK acquired for URL: {url}")
 
         metadata = get_metadata_with_cache(url)
@@ -139,6 +272,8 @@ def read_stream():
                 'message': 'Bot không đọc được nội dung từ link này. Có thể trang web đã thay đổi hoặc không được hỗ trợ.'
             }), 422
 
+        prefetch_next_chapter(url)
+
         content = metadata['content']
         if len(content) > MAX_CONTENT_LENGTH:
             content = content[:MAX_CONTENT_LENGTH]
@@ -149,10 +284,16 @@ def read_stream():
             temp_path = final_path.with_suffix('.mp3.tmp')
             success = False
             try:
-                with temp_path.open('wb') as f:
+                # tts_engine.stream() already coalesces TTS frames into larger buffers,
+                # so each one is written and yielded as is.
+                last_refresh = time.monotonic()
+                with temp_path.open('wb', buffering=1 << 20) as f:
                     for chunk in tts_engine.stream(content):
                         f.write(chunk)
                         yield chunk
+                        if time.monotonic() - last_refresh >= LOCK_REFRESH_SECONDS:
+                            refresh_cache_lock(lock_fd, lock_path)
+                            last_refresh = time.monotonic()
                 # If loop completes without error, rename and mark as success
                 temp_path.rename(final_path)
                 success = True
@@ -163,17 +304,22 @@ def read_stream():
                     app.logger.warning(f"Generation for {url} failed/cancelled. Cleaning up temp file.")
                     temp_path.unlink()
 
-        return Response(stream_with_context(generate_and_cache()), mimetype='audio/mpeg')
+        resp = Response(stream_with_context(generate_and_cache()), mimetype='audio/mpeg')
+        resp.headers['X-Accel-Buffering'] = 'no'
+        resp.headers['Cache-Control'] = 'no-cache'
+        # Keep the lock until the stream is closed, so other workers don't start a duplicate generation.
+        resp.call_on_close(release_lock)
+        streaming = True
+        return resp
 
     except Exception as e:
         app.logger.error(f"Outer exception in /api/read for {url}: {e}", exc_info=True)
         # This will be caught by the generic 500 handler
         raise
     finally:
-        # Always release the lock file
-        if lock_path.exists():
-            lock_path.unlink()
-            app.logger.info(f"LOCK released for URL: {url}")
+        # Release the lock here unless the streaming response has taken ownership of it.
+        if not streaming:
+            release_lock()
 
 
 # --- Global Error Handlers ---
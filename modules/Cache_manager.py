@@ -1,9 +1,17 @@
 import os
+import re
+import heapq
 import time
 import logging
 import typing
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: cache locks fall back to O_EXCL lock files.
+    fcntl = None
+
 # --- Module-level Configuration and Logging ---
 
 log = logging.getLogger(__name__)
@@ -31,12 +39,18 @@ CACHE_DIR_PATH = Path(__file__).resolve().parent.parent / CACHE_DIR_NAME
 CACHE_MAX_AGE_DAYS = _get_env_var("CACHE_MAX_AGE_DAYS", 7)
 CACHE_MAX_SIZE_MB = _get_env_var("CACHE_MAX_SIZE_MB", 400)
 CACHE_CLEANUP_TARGET_PERCENT = _get_env_var("CACHE_CLEANUP_TARGET_PERCENT", 70)
+# Number of threads used to stat cache files concurrently during size cleanup.
+CACHE_SCAN_WORKERS = _get_env_var("CACHE_SCAN_WORKERS", 16)
 
 # Pre-calculated byte values and constants for efficiency.
 CACHE_MAX_SIZE_BYTES = CACHE_MAX_SIZE_MB * 1024 * 1024
 CACHE_CLEANUP_TARGET_BYTES = CACHE_MAX_SIZE_BYTES * (CACHE_CLEANUP_TARGET_PERCENT / 100)
 SECONDS_IN_A_DAY = 86400
 STALE_TEMP_FILE_SECONDS = 3600  # 1 hour
+# Suffixes of temporary files left behind by interrupted generations.
+_STALE_SUFFIXES = ('.tmp', '.lock')
+# Names of files owned by the cache (hex key + suffix). Anything else is skipped before stat().
+_CACHE_NAME_RE = re.compile(r'^[0-9a-f]{32,64}\.(mp3|mp3\.tmp|lock)$')
 
 
 # --- Public API Functions ---
@@ -79,22 +93,93 @@ def touch_cache_file(file_path: Path) -> None:
         log.error(f"Failed to touch cache file {file_path}: {e}")
 
 
-def stream_from_path(file_path: Path) -> typing.Generator[bytes, None, None]:
+def acquire_cache_lock(lock_path: Path) -> typing.Optional[int]:
+    """
+    Acquires the generation lock for a cache entry, safely across processes (e.g., Gunicorn workers).
+    On POSIX the lock is an flock() on the lock file, which the kernel releases if a worker dies,
+    so a leftover file never blocks anyone. On Windows the lock file is created with
+    O_CREAT | O_EXCL, and one older than STALE_TEMP_FILE_SECONDS is removed first unless it is
+    still open by its holder.
+    Returns the lock's file descriptor, or None if the lock is held by someone else.
+    """
+    if fcntl is None:
+        try:
+            if time.time() - lock_path.stat().st_mtime > STALE_TEMP_FILE_SECONDS:
+                log.warning(f"Removing stale lock file {lock_path}.")
+                _remove_stale_lock(lock_path)
+        except FileNotFoundError:
+            pass
+
+        try:
+            return os.open(str(lock_path), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+
+    # A few attempts cover the case where the previous holder deletes the file between our
+    # open() and flock(); the lock only counts on the file currently at lock_path.
+    for _ in range(3):
+        lock_fd = os.open(str(lock_path), os.O_CREAT | os.O_WRONLY, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return None
+        try:
+            if os.path.samestat(os.fstat(lock_fd), os.stat(lock_path)):
+                os.utime(lock_fd)
+                return lock_fd
+        except FileNotFoundError:
+            pass
+        os.close(lock_fd)
+    return None
+
+
+def refresh_cache_lock(lock_fd: int, lock_path: Path) -> None:
     """
-    Streams a file from the cache in chunks.
-    This is a generator function to avoid loading the whole file into memory.
-    It defensively handles FileNotFoundError to mitigate race conditions with cleanup jobs.
+    Updates a held lock's modification time, so age-based cleanup keeps treating a
+    long-running generation as live.
     """
     try:
-        with file_path.open('rb') as f:
-            while chunk := f.read(8192):
-                yield chunk
-    except FileNotFoundError:
-        log.warning(f"Cache file {file_path} was deleted during access (race condition).")
-        return
+        os.utime(lock_fd if os.utime in os.supports_fd else lock_path)
     except OSError as e:
-        log.error(f"Error reading from cache file {file_path}: {e}")
-        return
+        log.error(f"Failed to refresh lock file {lock_path}: {e}")
+
+
+def release_cache_lock(lock_fd: int, lock_path: Path) -> None:
+    """
+    Releases a lock acquired with acquire_cache_lock by deleting the file and closing its descriptor.
+    """
+    if fcntl is not None:
+        # Delete while the flock is still held, so nobody can lock the file being removed.
+        lock_path.unlink(missing_ok=True)
+    try:
+        os.close(lock_fd)
+    except OSError as e:
+        log.error(f"Failed to close lock file descriptor for {lock_path}: {e}")
+    if fcntl is None:
+        # Windows cannot delete a file that is still open.
+        lock_path.unlink(missing_ok=True)
+
+
+def _remove_stale_lock(lock_path: Path) -> bool:
+    """
+    (Private) Deletes a lock file left behind by a dead worker.
+    Returns False, leaving the file in place, if the lock is still held.
+    """
+    if fcntl is not None:
+        lock_fd = acquire_cache_lock(lock_path)
+        if lock_fd is None:
+            return False
+        release_cache_lock(lock_fd, lock_path)
+        return True
+    try:
+        lock_path.unlink()
+    except PermissionError:
+        # Still open by the worker holding it.
+        return False
+    except FileNotFoundError:
+        pass
+    return True
 
 
 # --- Core Cleanup Logic ---
@@ -131,52 +216,80 @@ def _cleanup_by_age() -> int:
     stale_cutoff_time = now - STALE_TEMP_FILE_SECONDS
 
     try:
-        for path in CACHE_DIR_PATH.iterdir():
-            try:
-                stat_result = path.stat()
-                mtime = stat_result.st_mtime
-
-                is_stale_temp_file = (path.suffix in {'.tmp', '.lock'}) and (mtime < stale_cutoff_time)
-                is_old_cache_file = mtime < cutoff_time
-
-                if is_old_cache_file or is_stale_temp_file:
-                    path.unlink()
-                    deleted_count += 1
-            except FileNotFoundError:
-                # File was deleted by another process, ignore.
-                continue
-            except OSError as e:
-                log.error(f"Could not process or delete file {path} during age cleanup: {e}")
+        # os.scandir yields DirEntry objects whose stat() result is cached, so each
+        # file costs a single stat syscall and no intermediate Path allocation.
+        with os.scandir(CACHE_DIR_PATH) as it:
+            for entry in it:
+                if not _CACHE_NAME_RE.match(entry.name):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    stat_result = entry.stat()
+                    mtime = stat_result.st_mtime
+
+                    is_stale_temp_file = entry.name.endswith(_STALE_SUFFIXES) and (mtime < stale_cutoff_time)
+                    is_old_cache_file = mtime < cutoff_time
+
+                    if is_old_cache_file or is_stale_temp_file:
+                        if entry.name.endswith('.lock'):
+                            # A lock still held by a live generation is kept, however old it is.
+                            if not _remove_stale_lock(Path(entry.path)):
+                                continue
+                        else:
+                            os.unlink(entry.path)
+                        deleted_count += 1
+                except FileNotFoundError:
+                    # File was deleted by another process, ignore.
+                    continue
+                except OSError as e:
+                    log.error(f"Could not process or delete file {entry.path} during age cleanup: {e}")
     except OSError as e:
         log.error(f"Could not scan cache directory for age cleanup: {e}")
 
     return deleted_count
 
 
+def _stat_entry(entry: os.DirEntry) -> typing.Optional[typing.Tuple[float, str, int]]:
+    """
+    (Private) Stats a directory entry for the size scan, returning (mtime, path, size).
+    Tuples are ordered by mtime first, so they can be pushed onto a heap directly.
+    Returns None for non-regular files and files deleted in the meantime.
+    """
+    try:
+        if not entry.is_file(follow_symlinks=False):
+            return None
+        stat = entry.stat()
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        log.error(f"Could not stat file {entry.path} during size scan: {e}")
+        return None
+    return (stat.st_mtime, entry.path, stat.st_size)
+
+
 def _cleanup_by_size() -> int:
     """
     (Private) If total cache size exceeds the limit, deletes the least recently used
     files until the total size is below the target percentage.
+    Lock and temporary files belong to generations that may still be running; they are
+    left to the lock-aware age cleanup.
     """
-    files_to_scan = []
-    total_size = 0
-
     try:
-        for path in CACHE_DIR_PATH.iterdir():
-            if not path.is_file():
-                continue
-            try:
-                stat = path.stat()
-                files_to_scan.append({'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime})
-                total_size += stat.st_size
-            except FileNotFoundError:
-                continue
-            except OSError as e:
-                log.error(f"Could not stat file {path} during size scan: {e}")
+        with os.scandir(CACHE_DIR_PATH) as it:
+            entries = [
+                entry for entry in it
+                if _CACHE_NAME_RE.match(entry.name) and not entry.name.endswith(_STALE_SUFFIXES)
+            ]
     except OSError as e:
         log.error(f"Could not scan cache directory for size cleanup: {e}")
         return 0
 
+    # stat() releases the GIL, so parallel stats overlap round-trips on slow (e.g., network) storage.
+    with ThreadPoolExecutor(max_workers=CACHE_SCAN_WORKERS) as executor:
+        files_to_scan = [info for info in executor.map(_stat_entry, entries) if info is not None]
+    total_size = sum(size for _, _, size in files_to_scan)
+
     if total_size < CACHE_MAX_SIZE_BYTES:
         return 0
 
@@ -185,22 +298,23 @@ def _cleanup_by_size() -> int:
         f"({CACHE_MAX_SIZE_MB}MB). Starting LRU cleanup."
     )
 
-    files_to_scan.sort(key=lambda x: x['mtime'])
+    # heapify is O(N) and each pop O(log N); usually only a small fraction of the
+    # files must be evicted, so this avoids paying for a full O(N log N) sort.
+    heapq.heapify(files_to_scan)
 
     deleted_count = 0
-    for file_info in files_to_scan:
-        if total_size < CACHE_CLEANUP_TARGET_BYTES:
-            break
+    while files_to_scan and total_size >= CACHE_CLEANUP_TARGET_BYTES:
+        _, path, size = heapq.heappop(files_to_scan)
         try:
-            file_info['path'].unlink()
-            total_size -= file_info['size']
+            os.unlink(path)
+            total_size -= size
             deleted_count += 1
         except FileNotFoundError:
             # File already deleted, but we must still account for the size reduction.
-            total_size -= file_info['size']
+            total_size -= size
             continue
         except OSError as e:
-            log.error(f"Could not delete file {file_info['path']} during size cleanup: {e}")
+            log.error(f"Could not delete file {path} during size cleanup: {e}")
 
     log.info(f"Finished LRU cleanup. New size: {total_size / 1024**2:.2f}MB.")
     return deleted_count
\ No newline at end of file
@@ -1,16 +1,31 @@
 import logging
 import json
 import re
-import os
+import typing
+import functools
 import cloudscraper
+import httpx
+import soupsieve as sv
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urljoin
 import requests
+from pathlib import Path
+
+# orjson parses several times faster than the stdlib; its JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # --- Module Level Configuration & Initialization ---
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
 
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+REQUEST_TIMEOUT = 20  # seconds
+
+# Fallback client for sites that block the primary client, e.g. with a Cloudflare challenge.
 SESSION = cloudscraper.create_scraper(
     browser={
         'browser': 'chrome',
@@ -19,9 +34,36 @@ SESSION = cloudscraper.create_scraper(
     }
 )
 SESSION.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+    'User-Agent': USER_AGENT
 })
-REQUEST_TIMEOUT = 20  # seconds
+
+# Primary client: pooled keep-alive connections with HTTP/2 multiplexing. It sends the same
+# browser-like headers as the fallback session, except Accept-Encoding, which httpx sets to
+# the encodings it can actually decode.
+HTTPX_CLIENT = httpx.Client(
+    http2=True,
+    timeout=REQUEST_TIMEOUT,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    headers={k: v for k, v in SESSION.headers.items() if k.lower() != 'accept-encoding'},
+    follow_redirects=True
+)
+CLOUDFLARE_CHALLENGE_STATUS_CODES = {403, 503}
+# Pages are read incrementally and rejected beyond this size to cap memory per request.
+MAX_HTML_BYTES = 2 * 1024 * 1024
+HTML_READ_CHUNK_SIZE = 65536
+
+
+class PageTooLargeError(ValueError):
+    """Raised when a fetched page exceeds MAX_HTML_BYTES."""
+    pass
+
+# Prefer lxml's C parser, which is several times faster than the pure-Python 'html.parser'.
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+    logging.warning("lxml not installed, falling back to the slower 'html.parser'.")
 
 # Refined regex patterns for post-processing to be more specific and avoid false positives
 TEXT_CLEANUP_PATTERNS = [
@@ -31,44 +73,144 @@ TEXT_CLEANUP_PATTERNS = [
     re.compile(r'^\s*(o o o)\s*$', re.IGNORECASE | re.MULTILINE),
     re.compile(r'\b(truyenfull|sstruyen|tangthuvien|metruyencv)\.(vn|com)\b', re.IGNORECASE),
 ]
+# All cleanup patterns fused into one alternation, so the content is scanned in a single pass.
+TEXT_CLEANUP_RE = re.compile(
+    '|'.join(f'(?:{p.pattern})' for p in TEXT_CLEANUP_PATTERNS),
+    re.IGNORECASE | re.MULTILINE
+)
+# Blank-line runs left behind after removing junk lines are collapsed to a single paragraph break.
+EXCESS_NEWLINES_RE = re.compile(r'\n{3,}')
 
 SITE_CONFIG = {}
 REQUIRED_CONFIG_KEYS = {'title', 'content', 'next_url', 'prev_url'}
+CONFIG_PATH = Path(__file__).resolve().parent / 'selectors.json'
+# Modification time of selectors.json at the last load, used to detect edits.
+_config_mtime = None
+
+
+def _compile_selectors(config: dict) -> None:
+    """
+    Precompiles a site's CSS selectors once so they are not re-parsed by soupsieve on every request.
+    The compiled objects are stored alongside the raw selectors under '_'-prefixed keys.
+    """
+    config['_title_sel'] = sv.compile(config['title'])
+    config['_content_sel'] = sv.compile(config['content'])
+    config['_next_url_sel'] = sv.compile(config['next_url'])
+    config['_prev_url_sel'] = sv.compile(config['prev_url'])
+    # All junk selectors are fused into one selector list, so the content tree is walked only once.
+    junk_selectors = config.get('junk_selectors')
+    config['_junk_union_sel'] = sv.compile(', '.join(junk_selectors)) if junk_selectors else None
+
 
 def load_configs():
     """
     Loads and validates site configurations from an external JSON file.
     Only valid configurations are loaded into the application.
     """
-    global SITE_CONFIG
-    config_path = os.path.join(os.path.dirname(__file__), 'selectors.json')
+    global SITE_CONFIG, _config_mtime
     validated_configs = {}
     
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            raw_configs = json.load(f)
+        _config_mtime = CONFIG_PATH.stat().st_mtime
+        raw_configs = _json_loads(CONFIG_PATH.read_bytes())
     except FileNotFoundError:
-        logging.critical(f"Configuration file not found at {config_path}. Extractor will not function.")
+        logging.critical(f"Configuration file not found at {CONFIG_PATH}. Extractor will not function.")
         return
     except json.JSONDecodeError:
-        logging.critical(f"Error decoding JSON from {config_path}. Please check for syntax errors.")
+        logging.critical(f"Error decoding JSON from {CONFIG_PATH}. Please check for syntax errors.")
         return
 
     for domain, config in raw_configs.items():
         missing_keys = REQUIRED_CONFIG_KEYS - set(config.keys())
-        if not missing_keys:
-            validated_configs[domain] = config
-        else:
+        if missing_keys:
             logging.error(f"Configuration for domain '{domain}' is invalid. Missing required keys: {missing_keys}")
+            continue
+        try:
+            _compile_selectors(config)
+        except sv.SelectorSyntaxError as e:
+            logging.error(f"Configuration for domain '{domain}' is invalid. Bad CSS selector: {e}")
+            continue
+        validated_configs[domain] = config
             
     SITE_CONFIG = validated_configs
     logging.info(f"Successfully loaded and validated {len(SITE_CONFIG)} site configurations.")
 
 
+def reload_configs_if_changed():
+    """
+    Reloads site configurations if selectors.json was modified since the last load.
+    Costs a single stat call when nothing changed.
+    """
+    try:
+        mtime = CONFIG_PATH.stat().st_mtime
+    except OSError:
+        return
+    if _config_mtime is None or mtime > _config_mtime:
+        logging.info(f"Detected changes in {CONFIG_PATH}. Reloading site configurations.")
+        load_configs()
+
+
 # Load configurations when the module is imported
 load_configs()
 
 
+@functools.lru_cache(maxsize=1024)
+def _parse_base(url: str) -> tuple[str, str]:
+    """
+    Splits a URL into its base URL (scheme://netloc) and its domain without a leading 'www.'.
+    Uses plain string partitioning, which is much cheaper than urlparse for this purpose.
+    """
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return '', ''
+    netloc = rest
+    for delimiter in '/?#':
+        netloc = netloc.partition(delimiter)[0]
+    domain = netloc[4:] if netloc.startswith('www.') else netloc
+    return f"{scheme}://{netloc}", domain
+
+
+def _needs_fallback(response: httpx.Response) -> bool:
+    """
+    Detects responses the cloudscraper session should retry: any 403/503, whether from Cloudflare
+    or another WAF (a proxy may rewrite the Server header), or an explicit Cloudflare challenge.
+    """
+    return (
+        response.status_code in CLOUDFLARE_CHALLENGE_STATUS_CODES
+        or response.headers.get('cf-mitigated') == 'challenge'
+    )
+
+
+def _read_capped(chunks: typing.Iterable[bytes], url: str) -> bytes:
+    """Joins a response body read in chunks, aborting as soon as it exceeds MAX_HTML_BYTES."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        if len(buf) > MAX_HTML_BYTES:
+            raise PageTooLargeError(f"Page {url} exceeds the {MAX_HTML_BYTES} byte limit.")
+    return bytes(buf)
+
+
+def _fetch_html(url: str) -> bytes:
+    """
+    Fetches a page's raw HTML with the pooled HTTP/2 client, falling back to the
+    cloudscraper session on connection failures or blocked (403/503, challenge) responses.
+    The body is streamed so oversized pages are rejected without being fully downloaded.
+    """
+    try:
+        with HTTPX_CLIENT.stream('GET', url) as response:
+            if not _needs_fallback(response):
+                response.raise_for_status()
+                return _read_capped(response.iter_bytes(HTML_READ_CHUNK_SIZE), url)
+        logging.info(f"Blocked response (HTTP {response.status_code}) for {url}. Retrying with cloudscraper.")
+    except httpx.TransportError as e:
+        logging.warning(f"HTTP client failed for {url}: {e}. Retrying with cloudscraper.")
+
+    with SESSION.get(url, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        return _read_capped(response.iter_content(HTML_READ_CHUNK_SIZE), url)
+
+
 def fetch_and_parse(url: str) -> dict | None:
     """
     Fetches, parses, and cleans a story chapter from a supported URL, ensuring high data quality.
@@ -85,10 +227,10 @@ def fetch_and_parse(url: str) -> dict | None:
     Returns:
         A dictionary containing clean data on success, or None on failure.
     """
+    reload_configs_if_changed()
+
     try:
-        parsed_url = urlparse(url)
-        domain = parsed_url.netloc.replace('www.', '')
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        base_url, domain = _parse_base(url)
         
         if domain not in SITE_CONFIG:
             logging.warning(f"Domain not supported: {domain}")
@@ -101,18 +243,20 @@ def fetch_and_parse(url: str) -> dict | None:
     logging.info(f"Using config for domain: {domain}")
 
     try:
-        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        html = _fetch_html(url)
+        soup = BeautifulSoup(html, HTML_PARSER)
         #with open("debug_output.html", "w", encoding="utf-8") as f:
         #   f.write(soup.prettify())
-    except (requests.exceptions.RequestException, cloudscraper.exceptions.CloudflareException) as e:
+    except (httpx.HTTPError, requests.exceptions.RequestException, cloudscraper.exceptions.CloudflareException) as e:
         logging.error(f"Network or Cloudflare error fetching {url}: {e}")
         return None
+    except PageTooLargeError as e:
+        logging.error(str(e))
+        return None
 
     try:
-        def get_absolute_url(selector: str) -> str | None:
-            element = soup.select_one(selector)
+        def get_absolute_url(selector: sv.SoupSieve) -> str | None:
+            element = selector.select_one(soup)
             if not element:
                 return None
             
@@ -120,40 +264,43 @@ def fetch_and_parse(url: str) -> dict | None:
             if not href or href.strip() == '#' or href.lower().strip().startswith('javascript:'):
                 return None
                 
-            return urljoin(base_url, href.strip())
+            href = href.strip()
+            if href.startswith(('http://', 'https://')):
+                return href
+            return urljoin(base_url, href)
 
         # STEP 1: EXTRACT all required elements before any modification
-        title_element = soup.select_one(config['title'])
-        content_element = soup.select_one(config['content'])
+        title_element = config['_title_sel'].select_one(soup)
+        content_element = config['_content_sel'].select_one(soup)
 
         if not content_element:
             logging.error(f"Critical failure: Content selector '{config['content']}' not found for {url}.")
             return None
 
         title = title_element.get_text(strip=True) if title_element else "Không rõ tiêu đề"
-        next_url = get_absolute_url(config['next_url'])
-        prev_url = get_absolute_url(config['prev_url'])
+        next_url = get_absolute_url(config['_next_url_sel'])
+        prev_url = get_absolute_url(config['_prev_url_sel'])
 
         # STEP 2: CLEAN UP unwanted HTML tags *within* the content block
-        if config.get('junk_selectors'):
-            for selector in config['junk_selectors']:
-                for element in content_element.select(selector):
+        if config['_junk_union_sel']:
+            for element in config['_junk_union_sel'].select(content_element):
+                # Skip elements already removed together with a matched ancestor.
+                if not element.decomposed:
                     element.decompose()
 
         # STEP 3: REFINE the extracted text
-        content_text = content_element.get_text(separator='\n', strip=True)
+        content_text = '\n'.join(content_element.stripped_strings)
 
         # 3.1: Remove repeated title from the beginning of the content
         if title != "Không rõ tiêu đề":
             # Use replace with count=1 to only remove the first occurrence
             content_text = content_text.replace(title, '', 1)
 
-        # 3.2: Apply regex patterns to remove junk text
-        for pattern in TEXT_CLEANUP_PATTERNS:
-            content_text = pattern.sub('', content_text)
+        # 3.2: Apply the fused regex to remove junk text
+        content_text = TEXT_CLEANUP_RE.sub('', content_text)
 
         # 3.3: Normalize whitespace
-        content_text = re.sub(r'\n{3,}', '\n\n', content_text).strip()
+        content_text = EXCESS_NEWLINES_RE.sub('\n\n', content_text).strip()
 
         return {
             'title': title,
@@ -1,17 +1,39 @@
 import os
+import atexit
 import asyncio
-import queue
+import contextlib
+import functools
 import re
 import logging
 import typing
 import time
-from threading import Thread
+from bisect import bisect_left
+from collections import deque
+from threading import Event, Lock, Thread
 import edge_tts
 import platform 
 IS_WINDOWS = platform.system() == "Windows"
 
 # --- Module Level Configuration ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(module)s - %(message)s')
+log = logging.getLogger(__name__)
+
+# Event loop policy for the producer, resolved once at import time instead of on every engine.
+# On Windows, winloop is needed for TTS to work reliably. On POSIX, uvloop's libuv-based loop
+# cuts the per-read overhead of the TLS/WebSocket traffic edge-tts generates.
+_EVENT_LOOP_POLICY = None
+if IS_WINDOWS:
+    try:
+        import winloop
+        _EVENT_LOOP_POLICY = winloop.EventLoopPolicy()
+    except ImportError:
+        log.warning("winloop not installed, TTS might fail on Windows.")
+else:
+    try:
+        import uvloop
+        _EVENT_LOOP_POLICY = uvloop.EventLoopPolicy()
+    except ImportError:
+        log.info("uvloop not installed, TTS will use the default asyncio event loop.")
 
 # --- Constants ---
 # Max characters to send to TTS API in a single request.
@@ -20,8 +42,20 @@ TEXT_CHUNK_SIZE = 2500
 CONSUMER_TIMEOUT = 30
 # Timeout for the entire TTS stream generation for a single text chunk (in seconds).
 PRODUCER_STREAM_TIMEOUT = 60
-# Increased queue size to prevent back-pressure from a slow consumer causing false timeouts.
+# Max audio chunks buffered for the consumer before the producer waits for it to catch up.
+# Kept generous to prevent back-pressure from a slow consumer causing false timeouts.
 QUEUE_MAX_SIZE = 100
+# Number of text chunks synthesized concurrently, so the next chunk's network latency
+# overlaps the current chunk's audio instead of stalling between chunks.
+PIPELINE_DEPTH = 2
+# The consumer coalesces the small MP3 frames edge-tts delivers into buffers of up to this
+# many bytes, flushing early once STREAM_FLUSH_INTERVAL seconds pass so playback never stalls.
+STREAM_COALESCE_BYTES = 16 * 1024
+STREAM_FLUSH_INTERVAL = 0.02
+# Format of the rate/volume strings accepted by edge-tts, e.g. '+10%' or '-5%'.
+_PERCENT_RE = re.compile(r"^[+-]\d{1,3}%$")
+# Values seen on nearly every request (the '+0%' default and 5% steps), accepted without the regex.
+_COMMON_PERCENTS = frozenset(f"{sign}{i}%" for sign in ("+", "-") for i in range(0, 101, 5))
 
 class TTSEngineError(Exception):
     """Custom exception for TTSEngine specific errors, like timeouts or generation failures."""
@@ -38,14 +72,73 @@ class TTSEngine:
         self.voice = voice
         self.rate = self._validate_percent_string(rate, "rate")
         self.volume = self._validate_percent_string(volume, "volume")
+        # Last validated per-call override of each setting, so repeated overrides skip validation.
+        self._validated_overrides = {}
+
+        # A single long-lived event loop hosts the producers of every stream() call, so the
+        # thread and loop start-up cost is paid once per engine rather than once per request.
+        # It is started lazily by _ensure_loop(), in the process that actually streams.
+        self._loop = None
+        self._loop_thread = None
+        self._loop_pid = None
+        self._loop_lock = Lock()
+
+    @staticmethod
+    def _new_event_loop() -> asyncio.AbstractEventLoop:
+        """Creates the producer event loop, using winloop on Windows and uvloop elsewhere when available."""
+        if _EVENT_LOOP_POLICY is not None:
+            return _EVENT_LOOP_POLICY.new_event_loop()
+        return asyncio.new_event_loop()
+
+    @staticmethod
+    def _run_event_loop(loop: asyncio.AbstractEventLoop) -> None:
+        """Target for the engine's loop thread: runs the producer event loop until close()."""
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """
+        Returns the producer event loop, starting its thread on first use in the current process.
+        Threads do not survive fork(), so a child process (e.g. a gunicorn worker forked after
+        `--preload`) gets a loop and thread of its own instead of the parent's dead one.
+        """
+        pid = os.getpid()
+        if self._loop_pid != pid:
+            with self._loop_lock:
+                if self._loop_pid != pid:
+                    loop = self._new_event_loop()
+                    thread = Thread(target=self._run_event_loop, args=(loop,), name="tts-producer-loop", daemon=True)
+                    thread.start()
+                    self._loop, self._loop_thread, self._loop_pid = loop, thread, pid
+        return self._loop
+
+    def close(self) -> None:
+        """Stops the engine's event loop thread. The engine must not be used afterwards."""
+        # Nothing to stop if the loop was never started here, or belongs to a parent process.
+        if self._loop_pid != os.getpid() or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5.0)
+        if self._loop_thread.is_alive():
+            log.warning("TTS event loop thread did not stop cleanly.")
+            return
+        self._loop.close()
 
     @staticmethod
     def _validate_percent_string(value: str, name: str) -> str:
         """Validates that a string is a valid percentage format for edge-tts."""
-        if not isinstance(value, str) or not re.match(r"^[+-]\d{1,3}%$", value):
-            raise ValueError(
-                f"Invalid format for TTS {name}. Expected format like '+10%', got '{value}'."
-            )
+        if value.__class__ is str and (value in _COMMON_PERCENTS or _PERCENT_RE.match(value)):
+            return value
+        raise ValueError(
+            f"Invalid format for TTS {name}. Expected format like '+10%', got '{value}'."
+        )
+
+    def _resolve_percent(self, value: typing.Optional[str], name: str) -> str:
+        """Returns the per-call `rate`/`volume` override after validation, or the engine's own setting if none is given."""
+        if not value:
+            return self.rate if name == "rate" else self.volume
+        if self._validated_overrides.get(name) != value:
+            self._validated_overrides[name] = self._validate_percent_string(value, name)
         return value
 
     def _chunk_text(self, text: str) -> typing.Generator[str, None, None]:
@@ -57,147 +150,270 @@ class TTSEngine:
             return
 
         paragraphs = text.split('\n')
-        current_chunk = ""
+        # Paragraphs of the chunk being built, joined only when the chunk is yielded to avoid
+        # repeated string concatenation; current_len tracks the joined length incrementally.
+        current_parts = []
+        current_len = 0
 
         for p in paragraphs:
+            p_len = len(p)
             # If a single paragraph is too large, it must be force-split.
-            if len(p) >= TEXT_CHUNK_SIZE:
+            if p_len >= TEXT_CHUNK_SIZE:
                 # First, yield any preceding text in the current chunk.
-                if current_chunk:
-                    yield current_chunk
-                    current_chunk = ""
+                if current_parts:
+                    yield "\n".join(current_parts) + "\n"
+                    current_parts = []
+                    current_len = 0
                 
-                # Split the oversized paragraph by word boundaries.
+                # Split the oversized paragraph by word boundaries. The space positions are
+                # collected in one pass and bisected, instead of an rfind scan per piece.
+                spaces = [m.start() for m in re.finditer(' ', p)]
                 start = 0
-                while start < len(p):
+                while start < p_len:
+                    limit = start + TEXT_CHUNK_SIZE
                     # Find the last space within the chunk size limit.
-                    end = p.rfind(' ', start, start + TEXT_CHUNK_SIZE)
-                    if end == -1 or end <= start:
+                    i = bisect_left(spaces, limit) - 1
+                    if i >= 0 and spaces[i] > start:
+                        end = spaces[i]
+                    else:
                         # No space found, force cut.
-                        end = start + TEXT_CHUNK_SIZE
+                        end = limit
                     yield p[start:end]
                     start = end + 1 # +1 to skip the space
                 continue
             
             # If adding the next paragraph fits, append it.
-            if len(current_chunk) + len(p) + 1 < TEXT_CHUNK_SIZE:
-                current_chunk += p + "\n"
+            if current_len + p_len + 1 < TEXT_CHUNK_SIZE:
+                current_parts.append(p)
+                current_len += p_len + 1
             # Otherwise, yield the current chunk and start a new one.
             else:
-                yield current_chunk
-                current_chunk = p + "\n"
+                yield "\n".join(current_parts) + "\n" if current_parts else ""
+                current_parts = [p]
+                current_len = p_len + 1
         
         # Yield any remaining text in the last chunk.
-        if current_chunk.strip():
-            yield current_chunk
+        if current_parts:
+            last_chunk = "\n".join(current_parts) + "\n"
+            if last_chunk.strip():
+                yield last_chunk
+
+    def _split_text(self, text: str) -> typing.Iterable[str]:
+        """
+        Returns the text chunks to synthesize. Texts that fit in a single request skip
+        `_chunk_text` entirely, which is the common case for short chapters.
+        """
+        if len(text) <= TEXT_CHUNK_SIZE:
+            return (text,)
+        return self._chunk_text(text)
+
+    async def _generate_audio(self, text_chunks: typing.Iterable[str], rate: str, volume: str) -> typing.AsyncGenerator[bytes, None]:
+        """
+        Core async generator shared by `stream` and `stream_async`. Yields audio in text order while
+        up to PIPELINE_DEPTH chunks are generated concurrently. Raises TTSEngineError on failure.
+        """
+
+        # --- HÀM TRỢ GIÚP MỚI ---
+        # Hàm này nhận một đoạn text, stream nó và đưa vào queue riêng của đoạn đó.
+        # Đây là một 'coroutine' hoàn chỉnh.
+        async def stream_and_queue_chunk(text_chunk_to_stream, chunk_queue):
+            # A fresh Communicate (and connection) per chunk is deliberate: edge-tts 6.1.9 takes no
+            # session or connector, and in 7.x the ClientSession it builds owns and closes a passed
+            # connector. Its Sec-MS-GEC token is computed locally, so there is nothing to cache.
+            # PIPELINE_DEPTH already hides the per-chunk handshake behind the previous chunk's audio.
+            communicate = edge_tts.Communicate(text_chunk_to_stream, self.voice, rate=rate, volume=volume)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunk_queue.put_nowait(chunk["data"])
+
+        async def generate_chunk(text_chunk_to_stream, chunk_queue):
+            # Áp dụng timeout cho TOÀN BỘ quá trình tạo giọng đọc của đoạn này.
+            # asyncio.timeout() runs the coroutine in the current task, avoiding the extra task
+            # wait_for() wraps around it.
+            async with asyncio.timeout(PRODUCER_STREAM_TIMEOUT):
+                await stream_and_queue_chunk(text_chunk_to_stream, chunk_queue)
+
+        loop = asyncio.get_running_loop()  # Looked up once instead of per scheduled chunk.
+        text_chunks = (c for c in text_chunks if c.strip())
+        # (chunk_queue, task) pairs in text order; at most PIPELINE_DEPTH are in flight.
+        pending = deque()
+
+        def schedule_next_chunk():
+            text_chunk = next(text_chunks, None)
+            if text_chunk is None:
+                return
+            chunk_queue = asyncio.Queue()
+            task = loop.create_task(generate_chunk(text_chunk, chunk_queue))
+            # Mark the end of this chunk's audio, whether it succeeded, failed or was cancelled.
+            task.add_done_callback(lambda _: chunk_queue.put_nowait(None))
+            pending.append((chunk_queue, task))
+
+        # --- LOGIC CHÍNH ĐÃ ĐƯỢC SỬA LẠI ---
+        try:
+            for _ in range(PIPELINE_DEPTH):
+                schedule_next_chunk()
+
+            # Drain the chunks strictly in order while the next ones are already being generated.
+            while pending:
+                chunk_queue, task = pending[0]
+                while (data := await chunk_queue.get()) is not None:
+                    yield data
+                pending.popleft()
+                task.result()  # Re-raises this chunk's timeout or error, if any.
+                schedule_next_chunk()
+
+        except asyncio.TimeoutError:
+            log.error("TTS stream generation for a chunk timed out after %ss.", PRODUCER_STREAM_TIMEOUT)
+            raise TTSEngineError("Quá trình tạo giọng đọc cho một đoạn bị quá giờ.")
+        except Exception as e:
+            log.error("An exception occurred in the TTS producer: %s", e, exc_info=True)
+            raise TTSEngineError(f"Không thể tạo giọng đọc do lỗi: {type(e).__name__}")
+        finally:
+            # Stop chunks generated ahead (on error or early close) and wait for them to unwind.
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+    async def stream_async(self, text: str, rate: str = None, volume: str = None) -> typing.AsyncGenerator[bytes, None]:
+        """
+        Async counterpart of `stream` for callers already running an event loop (e.g. ASGI apps).
+        Audio is yielded directly from edge-tts, without the producer thread and queue hand-off.
+        """
+        if not text or not text.strip():
+            return
+
+        final_rate = self._resolve_percent(rate, "rate")
+        final_volume = self._resolve_percent(volume, "volume")
+        # aclosing() shuts the pipeline down as soon as this generator is closed, instead of
+        # leaving the chunks generated ahead to the garbage collector.
+        async with contextlib.aclosing(self._generate_audio(self._split_text(text), final_rate, final_volume)) as audio:
+            async for data in audio:
+                yield data
 
     def stream(self, text: str, rate: str = None, volume: str = None) -> typing.Generator[bytes, None, None]:
         """
-        Generates an audio stream from text. This is a generator function that manages a producer
-        thread and ensures its cleanup, even if the consumer (client) disconnects prematurely.
+        Generates an audio stream from text. This is a generator function that runs a producer on the
+        engine's event loop thread and ensures its cleanup, even if the consumer (client) disconnects prematurely.
+        Async callers should prefer `stream_async`, which avoids the thread entirely.
         """
         if not text or not text.strip():
             return
 
-        final_rate = self._validate_percent_string(rate, "rate") if rate else self.rate
-        final_volume = self._validate_percent_string(volume, "volume") if volume else self.volume
-        audio_queue = queue.Queue(maxsize=QUEUE_MAX_SIZE)
+        final_rate = self._resolve_percent(rate, "rate")
+        final_volume = self._resolve_percent(volume, "volume")
+        text_chunks = self._split_text(text)
+        # Single-producer/single-consumer hand-off: deque.append/popleft are atomic, so the only
+        # synchronization needed is a pair of Events instead of queue.Queue's lock and Conditions.
+        audio_buffer = deque()
+        item_ready = Event()   # Set by the producer after appending.
+        # Backpressure stays asyncio-native: a producer waiting for space awaits an asyncio.Event
+        # (so the shared loop keeps serving other streams and timeouts still fire), and the
+        # consumer wakes it via call_soon_threadsafe only while producer_waiting is set.
+        space_ready = asyncio.Event()
+        producer_waiting = Event()
+        consumer_closed = Event()  # Set once the consumer stops reading, e.g. on client disconnect.
+        producer_finished = Event()  # Set once the producer coroutine has fully unwound.
 
-        def _safe_put(item):
-            """Puts an item into the queue, discarding an old one if the queue is full."""
-            try:
-                audio_queue.put_nowait(item)
-            except queue.Full:
-                logging.warning("TTS audio_queue is full. Discarding oldest chunk to make space for a critical message.")
-                try:
-                    audio_queue.get_nowait() # Discard one old item.
-                    audio_queue.put_nowait(item) # Retry putting the new item.
-                except queue.Empty:
-                    pass # Should not happen, but defensive.
+        def _put(item):
+            """Hands an item (audio bytes, an exception or the None sentinel) to the consumer."""
+            audio_buffer.append(item)
+            item_ready.set()
 
         async def _produce_audio():
-            """The async producer function that runs in a separate thread."""
-
-            # --- HÀM TRỢ GIÚP MỚI ---
-            # Hàm này nhận một đoạn text, stream nó và đưa vào queue.
-            # Đây là một 'coroutine' hoàn chỉnh.
-            async def stream_and_queue_chunk(text_chunk_to_stream):
-                communicate = edge_tts.Communicate(text_chunk_to_stream, self.voice, rate=final_rate, volume=final_volume)
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        audio_queue.put(chunk["data"])
-
-            # --- LOGIC CHÍNH ĐÃ ĐƯỢC SỬA LẠI ---
+            """The async producer coroutine, run on the engine's event loop thread."""
             try:
-                # Lặp qua từng đoạn văn bản lớn
-                for text_chunk in self._chunk_text(text):
-                    if not text_chunk.strip():
-                        continue
-                    
-                    # Với mỗi đoạn, chúng ta gọi hàm trợ giúp ở trên VÀ
-                    # áp dụng timeout cho TOÀN BỘ quá trình thực thi của nó.
-                    await asyncio.wait_for(
-                        stream_and_queue_chunk(text_chunk),
-                        timeout=PRODUCER_STREAM_TIMEOUT
-                    )
-
-            except asyncio.TimeoutError:
-                logging.error(f"TTS stream generation for a chunk timed out after {PRODUCER_STREAM_TIMEOUT}s.")
-                _safe_put(TTSEngineError("Quá trình tạo giọng đọc cho một đoạn bị quá giờ."))
+                # aclosing() shuts the pipeline down right away if the consumer goes away mid-stream.
+                async with contextlib.aclosing(self._generate_audio(text_chunks, final_rate, final_volume)) as audio:
+                    async for data in audio:
+                        if len(audio_buffer) >= QUEUE_MAX_SIZE:
+                            space_ready.clear()
+                            producer_waiting.set()
+                            try:
+                                # Re-check after flagging, so a drain racing with the flag is not missed.
+                                # No timeout here: a slow or paused client is not an error, and a
+                                # consumer that goes away sets consumer_closed and cancels this task.
+                                if len(audio_buffer) >= QUEUE_MAX_SIZE and not consumer_closed.is_set():
+                                    await space_ready.wait()
+                            finally:
+                                producer_waiting.clear()
+                        if consumer_closed.is_set():
+                            return
+                        _put(data)
+            except TTSEngineError as e:
+                _put(e)
             except Exception as e:
-                logging.error(f"An exception occurred in the TTS producer thread: {e}", exc_info=True)
-                _safe_put(TTSEngineError(f"Không thể tạo giọng đọc do lỗi: {type(e).__name__}"))
+                log.error("Critical error in TTS producer: %s", e)
+                _put(TTSEngineError("Luồng xử lý giọng đọc đã gặp lỗi nghiêm trọng."))
             finally:
-                _safe_put(None)
-
-        def _run_producer_thread():
-            """Target for the producer thread to safely run the asyncio event loop."""
-            # --- BLOCK CODE SỬA LỖI CHO WINDOWS ---
-            if IS_WINDOWS:
-                try:
-                    import winloop
-                    asyncio.set_event_loop_policy(winloop.EventLoopPolicy())
-                except ImportError:
-                    logging.warning("winloop not installed, TTS might fail on Windows.")
-            # --- KẾT THÚC BLOCK SỬA LỖI ---
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(_produce_audio())
-            except Exception as e:
-                logging.error(f"Critical error in producer thread supervisor: {e}")
-                _safe_put(TTSEngineError("Luồng xử lý giọng đọc đã gặp lỗi nghiêm trọng."))
-            finally:
-                loop.close()
+                # Also runs on cancellation, so the sentinel is always emitted.
+                _put(None)
+                producer_finished.set()
+
+        loop = self._ensure_loop()
+        producer_future = asyncio.run_coroutine_threadsafe(_produce_audio(), loop)
 
-        producer_thread = Thread(target=_run_producer_thread, daemon=True)
-        producer_thread.start()
+        # Bound methods cached as locals for the hot consumer loop.
+        popleft = audio_buffer.popleft
+        clear_item_ready = item_ready.clear
+        wait_item_ready = item_ready.wait
+        is_producer_waiting = producer_waiting.is_set
+        monotonic = time.monotonic
+        pending = bytearray()
+        last_flush = monotonic()
 
         try:
             # Consumer loop in the main thread with timeout.
             while True:
-                try:
-                    chunk = audio_queue.get(timeout=CONSUMER_TIMEOUT)
-                    if chunk is None: break
-                    if isinstance(chunk, Exception): raise chunk
-                    yield chunk
-                except queue.Empty:
-                    logging.error("TTS consumer timed out. The producer thread is unresponsive or dead.")
-                    raise TTSEngineError("Quá trình tạo giọng đọc không phản hồi, vui lòng thử lại.")
+                if not audio_buffer:
+                    clear_item_ready()
+                    # Re-check after clearing, so an append racing with clear() is not missed.
+                    if not audio_buffer:
+                        if pending:
+                            # Wait no longer than the flush deadline while audio is held back.
+                            remaining = STREAM_FLUSH_INTERVAL - (monotonic() - last_flush)
+                            if remaining <= 0 or not wait_item_ready(remaining):
+                                yield bytes(pending)
+                                pending.clear()
+                                last_flush = monotonic()
+                                continue
+                        elif not wait_item_ready(CONSUMER_TIMEOUT):
+                            log.error("TTS consumer timed out. The producer is unresponsive or dead.")
+                            raise TTSEngineError("Quá trình tạo giọng đọc không phản hồi, vui lòng thử lại.")
+                # Take everything available in one batch, and let a waiting producer
+                # refill the buffer while the batch is being yielded.
+                batch = [popleft() for _ in range(len(audio_buffer))]
+                if is_producer_waiting():
+                    loop.call_soon_threadsafe(space_ready.set)
+                for chunk in batch:
+                    if isinstance(chunk, bytes):
+                        pending += chunk
+                        if len(pending) >= STREAM_COALESCE_BYTES or monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                            yield bytes(pending)
+                            pending.clear()
+                            last_flush = monotonic()
+                        continue
+                    # Sentinel or error: hand over the audio held back so far first.
+                    if pending:
+                        yield bytes(pending)
+                        pending.clear()
+                    if chunk is None:
+                        return
+                    raise chunk
         finally:
             # This block is crucial. It runs even if the client disconnects.
-            logging.debug("TTS consumer loop finished or terminated. Cleaning up producer thread.")
-            # Drain the queue to unblock the producer if it's stuck on put().
-            while not audio_queue.empty():
-                try:
-                    audio_queue.get_nowait()
-                except queue.Empty:
-                    break
-            # Wait for the producer thread to finish its work and exit.
-            producer_thread.join(timeout=5.0)
-            if producer_thread.is_alive():
-                logging.warning("TTS producer thread did not terminate cleanly after cleanup.")
+            log.debug("TTS consumer loop finished or terminated. Cleaning up producer.")
+            # Discard pending audio and release the producer in one step. The wake-up is sent
+            # unconditionally: checking producer_waiting first could race with a producer that
+            # is just about to wait, leaving it blocked for good.
+            consumer_closed.set()
+            audio_buffer.clear()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(space_ready.set)
+                # Cancel the producer rather than waiting for edge-tts to notice on its own;
+                # the cancellation tears down the in-flight requests within milliseconds.
+                producer_future.cancel()
+            if not producer_finished.wait(0.5):
+                log.warning("TTS producer did not terminate cleanly after cleanup.")
 
 def create_tts_engine() -> typing.Optional[TTSEngine]:
     """
@@ -210,17 +426,22 @@ def create_tts_engine() -> typing.Optional[TTSEngine]:
         volume = os.getenv('TTS_VOLUME', '+0%')
         
         engine = TTSEngine(voice=voice, rate=rate, volume=volume)
-        logging.info(f"TTS Engine created successfully with voice='{voice}', rate='{rate}', volume='{volume}'")
+        atexit.register(engine.close)
+        log.info("TTS Engine created successfully with voice='%s', rate='%s', volume='%s'", voice, rate, volume)
         return engine
     except ValueError as e:
-        logging.critical(f"FATAL: Could not create TTSEngine due to invalid configuration. {e}")
+        log.critical("FATAL: Could not create TTSEngine due to invalid configuration. %s", e)
         raise # Re-raise the exception to be caught by the application's main entry point.
 
 # --- Singleton Instance ---
-# A single, shared instance is created. If it fails, `default_engine` will be None,
-# and the application can check for this to disable TTS functionality gracefully.
-#try:
-#    default_engine = create_tts_engine()
-#except Exception:
-#    default_engine = None
-#    logging.critical("TTS Engine failed to initialize during module import. TTS functionality will be disabled.")
\ No newline at end of file
+# A single, shared instance is created lazily on first use, so importing this module stays cheap.
+# If it fails, `get_default_engine()` returns None and the application can check for this
+# to disable TTS functionality gracefully.
+@functools.cache
+def get_default_engine() -> typing.Optional[TTSEngine]:
+    """Returns the shared TTSEngine, creating it on the first call. Returns None if creation fails."""
+    try:
+        return create_tts_engine()
+    except Exception:
+        log.critical("TTS Engine failed to initialize. TTS functionality will be disabled.")
+        return None
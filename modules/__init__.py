@@ -9,15 +9,17 @@ chi tiết về cấu trúc file bên trong.
 
 # Các import được sắp xếp theo thứ tự alphabet của module
 from .Cache_manager import (
+    acquire_cache_lock,
     check_cache_exists,
     get_path_from_key,
+    refresh_cache_lock,
+    release_cache_lock,
     run_cleanup_routine,
     setup_cache_directory,
-    stream_from_path as stream_from_cache,
     touch_cache_file,
 )
 from .Extractor import fetch_and_parse
-from .Tts import TTSEngine, TTSEngineError, create_tts_engine
+from .Tts import TTSEngine, TTSEngineError, create_tts_engine, get_default_engine
 
 # Định nghĩa __all__ là một best practice trong Python.
 # Nó khai báo rõ những tên nào sẽ được import khi có lệnh `from modules import *`
@@ -26,12 +28,15 @@ from .Tts import TTSEngine, TTSEngineError, create_tts_engine
 __all__ = [
     "TTSEngine",
     "TTSEngineError",
+    "acquire_cache_lock",
     "check_cache_exists",
     "create_tts_engine",
     "fetch_and_parse",
+    "get_default_engine",
     "get_path_from_key",
+    "refresh_cache_lock",
+    "release_cache_lock",
     "run_cleanup_routine",
     "setup_cache_directory",
-    "stream_from_cache",
     "touch_cache_file",
 ]
\ No newline at end of file
@@ -0,0 +1,74 @@
+# test_cache_manager.py
+# Kiểm tra khóa cache (lock) và dọn dẹp cache trong một thư mục tạm.
+# Chạy bằng: python -m unittest test_cache_manager
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from modules import Cache_manager
+
+
+class CacheLockTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_dir = Path(tmp.name)
+        patcher = mock.patch.object(Cache_manager, "CACHE_DIR_PATH", self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lock_path = self.cache_dir / f"{'a' * 32}.lock"
+
+    def acquire(self):
+        return Cache_manager.acquire_cache_lock(self.lock_path)
+
+    def make_old(self, path: Path):
+        old = time.time() - Cache_manager.STALE_TEMP_FILE_SECONDS - 60
+        os.utime(path, (old, old))
+
+    def test_lock_is_exclusive_until_released(self):
+        lock_fd = self.acquire()
+        self.assertIsNotNone(lock_fd)
+        self.assertIsNone(self.acquire())
+        Cache_manager.release_cache_lock(lock_fd, self.lock_path)
+        self.assertFalse(self.lock_path.exists())
+        lock_fd = self.acquire()
+        self.assertIsNotNone(lock_fd)
+        Cache_manager.release_cache_lock(lock_fd, self.lock_path)
+
+    def test_leftover_lock_file_of_dead_worker_is_removed(self):
+        self.lock_path.touch()
+        self.make_old(self.lock_path)
+        self.assertTrue(Cache_manager._remove_stale_lock(self.lock_path))
+        self.assertFalse(self.lock_path.exists())
+
+    @unittest.skipIf(Cache_manager.fcntl is None, "an open file cannot be deleted on Windows anyway")
+    def test_held_lock_survives_cleanup(self):
+        lock_fd = self.acquire()
+        self.make_old(self.lock_path)
+        self.assertFalse(Cache_manager._remove_stale_lock(self.lock_path))
+
+        Cache_manager._cleanup_by_age()
+        # Force the size cleanup to run: any file counts as over the limit.
+        with mock.patch.object(Cache_manager, "CACHE_MAX_SIZE_BYTES", 0), \
+                mock.patch.object(Cache_manager, "CACHE_CLEANUP_TARGET_BYTES", 0):
+            (self.cache_dir / f"{'b' * 32}.mp3").write_bytes(b"x" * 10)
+            Cache_manager._cleanup_by_size()
+
+        self.assertTrue(self.lock_path.exists())
+        self.assertIsNone(self.acquire())
+        Cache_manager.release_cache_lock(lock_fd, self.lock_path)
+
+    def test_refresh_updates_mtime(self):
+        lock_fd = self.acquire()
+        self.make_old(self.lock_path)
+        Cache_manager.refresh_cache_lock(lock_fd, self.lock_path)
+        self.assertLess(time.time() - self.lock_path.stat().st_mtime, 60)
+        Cache_manager.release_cache_lock(lock_fd, self.lock_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
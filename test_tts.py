@@ -0,0 +1,187 @@
+# test_tts.py
+# Kiểm tra TTSEngine mà không cần mạng: edge_tts.Communicate được thay bằng một bản giả.
+# Chạy bằng: python -m unittest test_tts
+import asyncio
+import os
+import random
+import time
+import unittest
+from unittest import mock
+
+from modules import Tts
+
+
+class FakeCommunicate:
+    """Stand-in for edge_tts.Communicate that streams deterministic audio for its text."""
+    frames = 20
+    delay = 0.05
+    frame_delay = 0
+    fail_on = None
+    # Number of streams in progress, and the highest that number has been.
+    active = 0
+    max_active = 0
+
+    def __init__(self, text, voice, rate="+0%", volume="+0%", **kwargs):
+        self.text = text
+
+    async def stream(self):
+        cls = FakeCommunicate
+        cls.active += 1
+        cls.max_active = max(cls.max_active, cls.active)
+        try:
+            await asyncio.sleep(self.delay)  # Connection latency.
+            if self.fail_on and self.fail_on in self.text:
+                raise RuntimeError("boom")
+            for i in range(self.frames):
+                if self.frame_delay:
+                    await asyncio.sleep(self.frame_delay)
+                yield {"type": "audio", "data": fake_frame(self.text, i)}
+                yield {"type": "WordBoundary"}
+        finally:
+            cls.active -= 1
+
+
+def fake_frame(text: str, i: int) -> bytes:
+    # Padded to a realistic MP3 frame size, so a stalled consumer fills the buffer quickly.
+    return f"{text[:6]}|{i:03d};".encode().ljust(1024, b".")
+
+
+def make_text(n_chunks: int) -> str:
+    """Builds a text that `_chunk_text` splits into exactly n_chunks chunks."""
+    return "\n".join(f"P{i:04d} " + "x" * (Tts.TEXT_CHUNK_SIZE - 200) for i in range(n_chunks))
+
+
+def expected_audio(n_chunks: int) -> bytes:
+    return b"".join(
+        fake_frame(f"P{i:04d} ", j) for i in range(n_chunks) for j in range(FakeCommunicate.frames)
+    )
+
+
+class TTSEngineStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(Tts.edge_tts, "Communicate", FakeCommunicate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        FakeCommunicate.active = FakeCommunicate.max_active = 0
+        self.engine = Tts.TTSEngine("vi-VN-HoaiMyNeural")
+        self.addCleanup(self.engine.close)
+
+    def test_audio_order_across_pipeline(self):
+        # Chunks are generated PIPELINE_DEPTH at a time but must come out in text order.
+        self.assertEqual(b"".join(self.engine.stream(make_text(6))), expected_audio(6))
+        self.assertEqual(FakeCommunicate.max_active, Tts.PIPELINE_DEPTH)
+
+    def test_error_in_chunk_generated_ahead(self):
+        # The second chunk fails while the first is still being delivered: the first chunk's
+        # audio is delivered in full, then the error surfaces as TTSEngineError.
+        out = []
+        with mock.patch.object(FakeCommunicate, "fail_on", "P0001"):
+            with self.assertRaises(Tts.TTSEngineError), self.assertLogs(Tts.log, level="ERROR"):
+                for data in self.engine.stream(make_text(4)):
+                    out.append(data)
+        self.assertEqual(b"".join(out), expected_audio(1))
+        time.sleep(0.1)
+        self.assertEqual(FakeCommunicate.active, 0)
+
+    def test_early_close_cancels_producer(self):
+        with mock.patch.object(FakeCommunicate, "frame_delay", 0.01):
+            stream = self.engine.stream(make_text(6))
+            next(stream)
+            with self.assertNoLogs(Tts.log, level="WARNING"):
+                started = time.monotonic()
+                stream.close()
+                elapsed = time.monotonic() - started
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(FakeCommunicate.active, 0)
+
+    def test_slow_consumer_does_not_time_out_producer(self):
+        # A consumer that stalls for longer than CONSUMER_TIMEOUT with the buffer full must
+        # still receive the whole stream once it resumes reading.
+        with mock.patch.object(Tts, "CONSUMER_TIMEOUT", 0.3), \
+                mock.patch.object(Tts, "QUEUE_MAX_SIZE", 4), \
+                mock.patch.object(FakeCommunicate, "frames", 300):
+            out = []
+            for data in self.engine.stream(make_text(2)):
+                out.append(data)
+                if len(out) == 2:
+                    time.sleep(1.0)
+            self.assertEqual(b"".join(out), expected_audio(2))
+
+    def test_stream_async_order(self):
+        async def collect():
+            return b"".join([data async for data in self.engine.stream_async(make_text(4))])
+
+        self.assertEqual(asyncio.run(collect()), expected_audio(4))
+
+    def test_stream_async_early_aclose_stops_generation(self):
+        async def read_one_then_close():
+            stream = self.engine.stream_async(make_text(6))
+            await anext(stream)
+            await stream.aclose()
+            return FakeCommunicate.active
+
+        with mock.patch.object(FakeCommunicate, "frame_delay", 0.01):
+            self.assertEqual(asyncio.run(read_one_then_close()), 0)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "requires os.fork")
+    def test_stream_in_forked_child(self):
+        # The parent's loop thread does not survive fork(); the child must start its own.
+        self.assertEqual(b"".join(self.engine.stream(make_text(1))), expected_audio(1))
+        pid = os.fork()
+        if pid == 0:
+            ok = b"".join(self.engine.stream(make_text(1))) == expected_audio(1)
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+
+
+def baseline_chunk_text(text: str):
+    """The original string-concatenating splitter, kept as the reference for `_chunk_text`."""
+    if not text:
+        return
+
+    paragraphs = text.split('\n')
+    current_chunk = ""
+
+    for p in paragraphs:
+        if len(p) >= Tts.TEXT_CHUNK_SIZE:
+            if current_chunk:
+                yield current_chunk
+                current_chunk = ""
+            start = 0
+            while start < len(p):
+                end = p.rfind(' ', start, start + Tts.TEXT_CHUNK_SIZE)
+                if end == -1 or end <= start:
+                    end = start + Tts.TEXT_CHUNK_SIZE
+                yield p[start:end]
+                start = end + 1
+            continue
+
+        if len(current_chunk) + len(p) + 1 < Tts.TEXT_CHUNK_SIZE:
+            current_chunk += p + "\n"
+        else:
+            yield current_chunk
+            current_chunk = p + "\n"
+
+    if current_chunk.strip():
+        yield current_chunk
+
+
+class ChunkTextTest(unittest.TestCase):
+
+    def test_matches_baseline_splitter(self):
+        engine = Tts.TTSEngine.__new__(Tts.TTSEngine)  # _chunk_text needs no loop or config.
+        rng = random.Random(1234)
+        for chunk_size, rounds in ((5, 1500), (7, 1500), (Tts.TEXT_CHUNK_SIZE, 100)):
+            with mock.patch.object(Tts, "TEXT_CHUNK_SIZE", chunk_size):
+                for _ in range(rounds):
+                    text = "".join(
+                        rng.choice("ab  \n\t") if rng.random() < 0.5 else "x"
+                        for _ in range(rng.randint(0, chunk_size * 8))
+                    )
+                    self.assertEqual(list(engine._chunk_text(text)), list(baseline_chunk_text(text)), text)
+
+
+if __name__ == "__main__":
+    unittest.main()